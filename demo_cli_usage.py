@@ -6,52 +6,185 @@ This script demonstrates different ways to use the recreated mega module CLI int
 to download the provided file: https://mega.nz/file/5r1nWZwK#DlBpWv2Hc0zLhjuldVF8ZJKepkBfZyNYPh7feSOA7jI
 """
 
+import collections
+import concurrent.futures
+import contextlib
+import importlib
+import io
 import subprocess
 import sys
 import os
-from pathlib import Path
+import threading
 
 # Test URL
 TEST_URL = "https://mega.nz/file/5r1nWZwK#DlBpWv2Hc0zLhjuldVF8ZJKepkBfZyNYPh7feSOA7jI"
 
+# Guard stdout so parallel run_command calls don't interleave their output
+print_lock = threading.Lock()
+
+# Known entry points that can be called in-process instead of paying a
+# full interpreter start-up per test. Keyed by script name / -m target,
+# resolved lazily so the demo still starts if one of them can't import.
+INPROCESS = {
+    "quick_test.py": ("quick_test", "main"),
+    "mega_downloader_cli.py": ("mega_downloader_cli", "main"),
+    "test_mega_module.py": ("test_mega_module", "main"),
+    "pyobidl.downloader": ("pyobidl.downloader", "main"),
+}
+
+# sys.argv and stdout redirection are process-global, so in-process
+# runs have to be serialized even when run_command is called from threads
+_inprocess_lock = threading.Lock()
+
+
+def _resolve_inprocess(cmd):
+    """Return the in-process main() for a [sys.executable, ...] command, or None"""
+    if len(cmd) < 2 or cmd[0] != sys.executable:
+        return None, None
+    if cmd[1] == "-m" and len(cmd) > 2:
+        key, argv = cmd[2], cmd[2:]
+    else:
+        key, argv = os.path.basename(cmd[1]), cmd[1:]
+    if key not in INPROCESS:
+        return None, None
+    module_name, attr = INPROCESS[key]
+    try:
+        module = importlib.import_module(module_name)
+        return getattr(module, attr), argv
+    except Exception:
+        return None, None
+
+
+def _run_inprocess(func, argv):
+    """Call an entry point with patched sys.argv, capturing its output"""
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    with _inprocess_lock:
+        old_argv = sys.argv
+        sys.argv = list(argv)
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                result = func()
+            success = result is not False
+        except SystemExit as e:
+            success = not e.code
+        except Exception as e:
+            stderr.write(f"❌ Error running in-process: {e}\n")
+            success = False
+        finally:
+            sys.argv = old_argv
+    return success, stdout.getvalue(), stderr.getvalue()
+
+
 def run_command(cmd, description):
     """Run a command and show the result"""
-    print(f"\n{'='*60}")
-    print(f"🧪 {description}")
-    print(f"{'='*60}")
-    print(f"Command: {' '.join(cmd)}")
-    print("-" * 60)
-    
+    func, argv = _resolve_inprocess(cmd)
+    if func:
+        success, out, err = _run_inprocess(func, argv)
+        with print_lock:
+            print(f"\n{'='*60}")
+            print(f"🧪 {description}")
+            print(f"{'='*60}")
+            print(f"Command (in-process): {' '.join(cmd)}")
+            print("-" * 60)
+            if out:
+                print("STDOUT:")
+                print(out)
+            if err:
+                print("STDERR:")
+                print(err)
+            print(f"Success: {success}")
+            return success
+
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        if result.stdout:
+        returncode, stdout, stderr = _run_subprocess(cmd, timeout=300)
+        error = None
+    except subprocess.TimeoutExpired:
+        returncode = None
+        stdout = stderr = b""
+        error = "❌ Command timed out (5 minutes)"
+    except Exception as e:
+        returncode = None
+        stdout = stderr = b""
+        error = f"❌ Error running command: {e}"
+
+    with print_lock:
+        print(f"\n{'='*60}")
+        print(f"🧪 {description}")
+        print(f"{'='*60}")
+        print(f"Command: {' '.join(cmd)}")
+        print("-" * 60)
+
+        if error:
+            print(error)
+            return False
+
+        if stdout:
             print("STDOUT:")
-            print(result.stdout)
-        
-        if result.stderr:
+            print(stdout.decode("utf-8", "replace"))
+
+        if stderr:
             print("STDERR:")
-            print(result.stderr)
-        
-        print(f"Return code: {result.returncode}")
-        return result.returncode == 0
-        
+            print(stderr.decode("utf-8", "replace"))
+
+        print(f"Return code: {returncode}")
+        return returncode == 0
+
+
+def _run_subprocess(cmd, timeout):
+    """Run a command, draining its pipes into bounded buffers
+
+    Unlike capture_output=True this keeps only the last 2000 lines per
+    stream, so verbose download tests can't balloon memory while running.
+    Output stays as bytes; callers decode only what they print.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+
+    buffers = {}
+    drains = []
+    for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+        buffers[name] = collections.deque(maxlen=2000)
+        t = threading.Thread(target=_drain_pipe, args=(pipe, buffers[name]),
+                             daemon=True)
+        t.start()
+        drains.append(t)
+
+    try:
+        proc.wait(timeout=timeout)
     except subprocess.TimeoutExpired:
-        print("❌ Command timed out (5 minutes)")
-        return False
-    except Exception as e:
-        print(f"❌ Error running command: {e}")
-        return False
+        proc.kill()
+        proc.wait()
+        raise
+    for t in drains:
+        t.join()
+
+    return proc.returncode, b"".join(buffers["stdout"]), b"".join(buffers["stderr"])
+
+
+def _drain_pipe(pipe, buffer):
+    """Read a child pipe line by line into a bounded deque"""
+    with pipe:
+        for line in pipe:
+            buffer.append(line)
 
 def main():
+    # Block-buffer stdout for the duration of the demo so the many small
+    # prints coalesce into large writes; flushed once on exit
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False)
+
     print("🚀 Mega Module CLI Demo")
     print("="*60)
     print(f"Test URL: {TEST_URL}")
     
-    # Create demo directories
+    # Create demo directories (plain os.mkdir, no pathlib wrapper)
     dirs = ["./demo_simple", "./demo_universal", "./demo_verbose"]
     for dir_path in dirs:
-        Path(dir_path).mkdir(exist_ok=True)
+        try:
+            os.mkdir(dir_path)
+        except FileExistsError:
+            pass
     
     results = {}
     
@@ -62,64 +195,64 @@ def main():
     print(f"3. Universal Downloader CLI")
     print(f"4. Comprehensive Test Suite")
     
-    # 1. Quick test
-    results["Quick Test"] = run_command(
-        [sys.executable, "quick_test.py"],
-        "Testing Quick Download Script"
-    )
-    
-    # 2. Mega CLI - Basic
-    results["Mega CLI Basic"] = run_command(
-        [sys.executable, "mega_downloader_cli.py", TEST_URL, "./demo_simple"],
-        "Testing Mega CLI - Basic Download"
-    )
-    
-    # 3. Mega CLI - Verbose
-    results["Mega CLI Verbose"] = run_command(
-        [sys.executable, "mega_downloader_cli.py", TEST_URL, "./demo_verbose", "-v"],
-        "Testing Mega CLI - Verbose Mode"
-    )
-    
-    # 4. Universal Downloader
-    results["Universal Downloader"] = run_command(
-        [sys.executable, "-m", "pyobidl.downloader", TEST_URL, "./demo_universal", "-v"],
-        "Testing Universal Downloader CLI"
-    )
-    
-    # 5. Comprehensive Test Suite
-    results["Comprehensive Tests"] = run_command(
-        [sys.executable, "test_mega_module.py"],
-        "Running Comprehensive Test Suite"
-    )
+    # Each test targets its own output directory, so they are independent
+    # and can run in parallel (the batch is network-I/O bound).
+    tests = [
+        ("Quick Test",
+         [sys.executable, "quick_test.py"],
+         "Testing Quick Download Script"),
+        ("Mega CLI Basic",
+         [sys.executable, "mega_downloader_cli.py", TEST_URL, "./demo_simple"],
+         "Testing Mega CLI - Basic Download"),
+        ("Mega CLI Verbose",
+         [sys.executable, "mega_downloader_cli.py", TEST_URL, "./demo_verbose", "-v"],
+         "Testing Mega CLI - Verbose Mode"),
+        ("Universal Downloader",
+         [sys.executable, "-m", "pyobidl.downloader", TEST_URL, "./demo_universal", "-v"],
+         "Testing Universal Downloader CLI"),
+        ("Comprehensive Tests",
+         [sys.executable, "test_mega_module.py"],
+         "Running Comprehensive Test Suite"),
+    ]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(5, len(tests))) as ex:
+        futs = {ex.submit(run_command, cmd, desc): name for name, cmd, desc in tests}
+        for fut in concurrent.futures.as_completed(futs):
+            results[futs[fut]] = fut.result()
     
     # Summary
     print(f"\n{'='*60}")
     print("📊 CLI DEMO RESULTS")
     print(f"{'='*60}")
     
-    passed = 0
+    passed = sum(1 for success in results.values() if success)
     total = len(results)
-    
-    for test_name, success in results.items():
-        status = "✅ SUCCESS" if success else "❌ FAILED"
-        print(f"{status} {test_name}")
-        if success:
-            passed += 1
-    
-    print("-" * 60)
-    print(f"🎯 Overall: {passed}/{total} CLI tests successful ({passed/total*100:.1f}%)")
-    
+
+    # Batch the summary into one write instead of one syscall per line
+    lines = [f"{'✅ SUCCESS' if success else '❌ FAILED'} {test_name}"
+             for test_name, success in results.items()]
+    lines.append("-" * 60)
+    lines.append(f"🎯 Overall: {passed}/{total} CLI tests successful ({passed/total*100:.1f}%)")
+
     # Show downloaded files
-    print(f"\n📁 Downloaded files in demo directories:")
+    lines.append(f"\n📁 Downloaded files in demo directories:")
     for dir_path in dirs:
-        files = list(Path(dir_path).glob("*"))
-        if files:
-            print(f"\n{dir_path}:")
-            for file in files:
-                size = file.stat().st_size if file.is_file() else "DIR"
-                print(f"  📄 {file.name} ({size} bytes)" if size != "DIR" else f"  📁 {file.name}/")
+        # scandir returns cached stat data per entry, avoiding one
+        # stat syscall per file that Path.glob + stat() would pay
+        with os.scandir(dir_path) as it:
+            entries = list(it)
+        if entries:
+            lines.append(f"\n{dir_path}:")
+            for entry in entries:
+                if entry.is_file():
+                    size = entry.stat(follow_symlinks=False).st_size
+                    lines.append(f"  📄 {entry.name} ({size} bytes)")
+                else:
+                    lines.append(f"  📁 {entry.name}/")
         else:
-            print(f"\n{dir_path}: (empty)")
+            lines.append(f"\n{dir_path}: (empty)")
+
+    sys.stdout.write("\n".join(lines) + "\n")
     
     # Usage examples
     print(f"\n{'='*60}")
@@ -162,5 +295,6 @@ if __name__ == "__main__":
     print(f"\n💡 Tip: If downloads fail, try installing megatools:")
     print(f"   macOS: brew install megatools")
     print(f"   Ubuntu: sudo apt install megatools")
-    
-    sys.exit(0 if success else 1) 
\ No newline at end of file
+
+    sys.stdout.flush()
+    sys.exit(0 if success else 1)
\ No newline at end of file
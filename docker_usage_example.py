@@ -5,56 +5,77 @@ Docker Usage Example for Recreated PyObidl Mega Module
 This example shows how to use the recreated mega module in a Docker environment.
 """
 
+import asyncio
 import os
 import logging
-from pyobidl.megacli.mega import Mega
+from pyobidl.megacli.mega import get_mega
 from pyobidl.downloader import UniversalDownloader
-from pyobidl.utils import setup_logging
+from pyobidl.utils import setup_logging, ensure_dir_exists
 
-def test_docker_environment():
+# Test URL
+TEST_URL = "https://mega.nz/file/5r1nWZwK#DlBpWv2Hc0zLhjuldVF8ZJKepkBfZyNYPh7feSOA7jI"
+
+# Parsed (file_id, key) for TEST_URL, computed once per process
+_parsed_test_url = None
+
+def _get_parsed_test_url():
+    global _parsed_test_url
+    if _parsed_test_url is None:
+        _parsed_test_url = get_mega().parse_mega_url(TEST_URL)
+    return _parsed_test_url
+
+async def test_docker_environment():
     """Test that all components work in Docker"""
-    
+
     # Setup logging
     setup_logging(verbose=True)
     logger = logging.getLogger(__name__)
-    
+
     logger.info("🐳 Testing PyObidl in Docker environment")
-    
-    # Test 1: Check if megatools is available
-    import shutil
-    if shutil.which('megadl'):
-        logger.info("✅ megatools (megadl) is available")
-    else:
+
+    # The four checks are independent, so run them concurrently and
+    # let slow ones (disk probe, Mega construction) overlap
+    async def check_megadl():
+        import shutil
+        if await asyncio.to_thread(shutil.which, 'megadl'):
+            logger.info("✅ megatools (megadl) is available")
+            return True
         logger.error("❌ megatools (megadl) not found!")
         return False
-    
-    # Test 2: Create mega instance
-    try:
-        mega = Mega()
-        logger.info("✅ Mega instance created successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to create Mega instance: {e}")
-        return False
-    
-    # Test 3: Test URL parsing
-    test_url = "https://mega.nz/file/5r1nWZwK#DlBpWv2Hc0zLhjuldVF8ZJKepkBfZyNYPh7feSOA7jI"
-    file_id, key = mega.parse_mega_url(test_url)
-    
-    if file_id and key:
-        logger.info(f"✅ URL parsing works: {file_id}")
-    else:
+
+    async def check_mega():
+        try:
+            await asyncio.to_thread(get_mega)
+            logger.info("✅ Mega instance created successfully")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to create Mega instance: {e}")
+            return False
+
+    async def check_parse():
+        file_id, key = await asyncio.to_thread(_get_parsed_test_url)
+        if file_id and key:
+            logger.info(f"✅ URL parsing works: {file_id}")
+            return True
         logger.error("❌ URL parsing failed")
         return False
-    
-    # Test 4: Universal downloader
-    try:
-        downloader = UniversalDownloader()
-        platform = downloader.detect_platform(test_url)
-        logger.info(f"✅ Universal downloader works, detected: {platform}")
-    except Exception as e:
-        logger.error(f"❌ Universal downloader failed: {e}")
+
+    async def check_universal():
+        try:
+            platform = await asyncio.to_thread(
+                lambda: UniversalDownloader().detect_platform(TEST_URL))
+            logger.info(f"✅ Universal downloader works, detected: {platform}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Universal downloader failed: {e}")
+            return False
+
+    results = await asyncio.gather(check_megadl(), check_mega(),
+                                   check_parse(), check_universal(),
+                                   return_exceptions=True)
+    if not all(result is True for result in results):
         return False
-    
+
     logger.info("🎉 All Docker environment tests passed!")
     return True
 
@@ -65,11 +86,11 @@ def download_mega_file(url, output_dir="/downloads"):
     logger = logging.getLogger(__name__)
     
     try:
-        # Ensure download directory exists
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Use the simple download method
-        mega = Mega()
+        # Ensure download directory exists (memoized, one mkdir per process)
+        ensure_dir_exists(output_dir)
+
+        # Use the simple download method (shared instance, no re-construction)
+        mega = get_mega()
         logger.info(f"🚀 Downloading: {url}")
         
         success = mega.simple_download(url, output_dir)
@@ -77,13 +98,18 @@ def download_mega_file(url, output_dir="/downloads"):
         if success:
             logger.info(f"✅ Download completed to: {output_dir}")
             
-            # List downloaded files
-            files = [f for f in os.listdir(output_dir) if os.path.isfile(os.path.join(output_dir, f))]
-            for file in files:
-                file_path = os.path.join(output_dir, file)
-                size = os.path.getsize(file_path)
-                logger.info(f"📄 Downloaded: {file} ({size:,} bytes)")
-                
+            # List downloaded files (single scandir pass, cached stat data)
+            with os.scandir(output_dir) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except FileNotFoundError:
+                        # entry vanished between scandir and stat
+                        continue
+                    logger.info(f"📄 Downloaded: {entry.name} ({size:,} bytes)")
+
             return True
         else:
             logger.error("❌ Download failed")
@@ -100,9 +126,9 @@ def download_universal(url, output_dir="/downloads"):
     logger = logging.getLogger(__name__)
     
     try:
-        # Ensure download directory exists
-        os.makedirs(output_dir, exist_ok=True)
-        
+        # Ensure download directory exists (memoized, one mkdir per process)
+        ensure_dir_exists(output_dir)
+
         # Use universal downloader
         downloader = UniversalDownloader()
         platform = downloader.detect_platform(url)
@@ -125,16 +151,13 @@ def download_universal(url, output_dir="/downloads"):
 
 if __name__ == "__main__":
     # Test Docker environment
-    if test_docker_environment():
+    if asyncio.run(test_docker_environment()):
         print("🐳 Docker environment is ready for PyObidl!")
-        
-        # Example downloads
-        test_url = "https://mega.nz/file/5r1nWZwK#DlBpWv2Hc0zLhjuldVF8ZJKepkBfZyNYPh7feSOA7jI"
-        
+
         # Download using simple method
-        download_mega_file(test_url, "/tmp/downloads")
-        
+        download_mega_file(TEST_URL, "/tmp/downloads")
+
         # Download using universal method
-        download_universal(test_url, "/tmp/universal_downloads")
+        download_universal(TEST_URL, "/tmp/universal_downloads")
     else:
         print("❌ Docker environment setup failed!") 
\ No newline at end of file
@@ -8,9 +8,6 @@ This shows your exact original code working perfectly with the new recreated meg
 import os
 import sys
 
-# Add the pyobidl directory to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'pyobidl'))
-
 from pyobidl.downloader import Downloader
 
 def example_usage():
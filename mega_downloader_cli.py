@@ -8,19 +8,20 @@ Usage: python mega_downloader_cli.py [mega_url] [output_directory]
 
 import os
 import sys
-import argparse
 import logging
 
-# Add the pyobidl directory to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'pyobidl'))
-
-from pyobidl.megacli.mega import Mega
+from pyobidl.megacli.mega import get_mega
 from pyobidl.utils import setup_logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_URL = 'https://mega.nz/file/B3kg2ZqC#aEOZ5e6OJYV-H8aKFY8nWhX-wxwZQL21hlWV1Sj9jg4'
+
+
+def _build_parser():
+    """Full argparse parser, only built when --help is requested"""
+    import argparse
 
-def main():
     parser = argparse.ArgumentParser(
         description="Download files from Mega.nz using the pyobidl mega module",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -30,35 +31,53 @@ Examples:
   python mega_downloader_cli.py "https://mega.nz/file/B3kg2ZqC#aEOZ5e6OJYV-H8aKFY8nWhX-wxwZQL21hlWV1Sj9jg4" ./downloads
         """
     )
-    
+
     parser.add_argument(
         'url',
         nargs='?',
-        default='https://mega.nz/file/B3kg2ZqC#aEOZ5e6OJYV-H8aKFY8nWhX-wxwZQL21hlWV1Sj9jg4',
+        default=DEFAULT_URL,
         help='Mega.nz file URL'
     )
-    
+
     parser.add_argument(
         'output_dir',
         nargs='?',
         default=None,
         help='Output directory (optional, defaults to current directory)'
     )
-    
+
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
         help='Enable verbose logging'
     )
-    
+
     parser.add_argument(
         '--login',
         action='store_true',
         help='Use authenticated login (requires MEGA_EMAIL and MEGA_PASSWORD env vars)'
     )
-    
-    args = parser.parse_args()
-    
+
+    return parser
+
+
+class _Args:
+    """Hand-parsed arguments; argparse is only loaded for --help"""
+    def __init__(self, argv):
+        self.verbose = '-v' in argv or '--verbose' in argv
+        self.login = '--login' in argv
+        positional = [a for a in argv if not a.startswith('-')]
+        self.url = positional[0] if positional else DEFAULT_URL
+        self.output_dir = positional[1] if len(positional) > 1 else None
+
+
+def main():
+    if '-h' in sys.argv[1:] or '--help' in sys.argv[1:]:
+        _build_parser().parse_args()
+        return
+
+    args = _Args(sys.argv[1:])
+
     # Setup logging
     setup_logging(verbose=args.verbose)
     
@@ -67,8 +86,8 @@ Examples:
     logger.info(f"URL: {args.url}")
     
     try:
-        # Create Mega instance
-        mega = Mega()
+        # Reuse the shared Mega instance
+        mega = get_mega()
         
         # Login if requested
         if args.login:
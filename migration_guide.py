@@ -48,10 +48,10 @@ def complete_example():
     # ============ NEW WAY ============
     from pyobidl.downloader import UniversalDownloader
     from pyobidl.megacli.mega import Mega
-    import os
-    
+    from pyobidl.utils import ensure_dir_exists
+
     extract_folder = "temp"
-    os.makedirs(extract_folder, exist_ok=True)
+    ensure_dir_exists(extract_folder)
     
     # Method 1: Universal (recommended)
     dl = UniversalDownloader()
@@ -96,9 +96,9 @@ def simple_replacement():
     # Replace with:
     extract_folder = "temp"
     from pyobidl.downloader import UniversalDownloader
-    import os
-    
-    os.makedirs(extract_folder, exist_ok=True)
+    from pyobidl.utils import ensure_dir_exists
+
+    ensure_dir_exists(extract_folder)
     dl = UniversalDownloader()
     
     # Now instead of: dl.download_url(url)
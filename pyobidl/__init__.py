@@ -20,24 +20,34 @@ Usage:
     downloader.download("https://mega.nz/file/...", "./downloads")
 """
 
+import importlib
+
 from .version import __version__
 
 __all__ = [
     '__version__',
     'Mega',
     'UniversalDownloader',
-    'YoutubeDownloader', 
+    'YoutubeDownloader',
     'MediaFireDownloader',
     'GoogleDriveDownloader'
 ]
 
-# Optional: Import main classes for convenience
-try:
-    from .megacli.mega import Mega
-    from .downloader import UniversalDownloader
-    from .youtube import YoutubeDownloader
-    from .mediafire import MediaFireDownloader
-    from .googledrive import GoogleDriveDownloader
-except ImportError:
-    # Don't fail if dependencies are missing
-    pass 
\ No newline at end of file
+# Lazy imports (PEP 562): resolve the convenience classes on first access
+# so `import pyobidl` doesn't pay for every backend's dependency stack.
+_LAZY_IMPORTS = {
+    'Mega': 'pyobidl.megacli.mega',
+    'UniversalDownloader': 'pyobidl.downloader',
+    'YoutubeDownloader': 'pyobidl.youtube',
+    'MediaFireDownloader': 'pyobidl.mediafire',
+    'GoogleDriveDownloader': 'pyobidl.googledrive',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(_LAZY_IMPORTS[name])
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}") 
\ No newline at end of file
@@ -1,15 +1,24 @@
+import functools
+import re
 import requests
 from bs4 import BeautifulSoup
 import os
 import logging
-from .utils import ensure_dir_exists, makeSafeFilename
+
+# Optional C-based HTML parser; several times faster than bs4's pure
+# Python tokenizer when installed
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+from .utils import ensure_dir_exists, makeSafeFilename, DOWNLOAD_CHUNK
 
 logger = logging.getLogger(__name__)
 
 
 class GoogleDriveDownloader:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, session=None):
+        self.session = session or requests.Session()
 
     def download(self, url, output_dir=None):
         """
@@ -18,16 +27,16 @@ class GoogleDriveDownloader:
         Args:
             url (str): Google Drive URL
             output_dir (str): Directory to save the file (optional)
-            
+
         Returns:
-            bool: True if successful, False otherwise
+            str: Path of the downloaded file, None if failed
         """
         try:
             # Get file info
             file_info = self.get_file_info(url)
             if not file_info:
                 logger.error("Failed to get Google Drive file info")
-                return False
+                return None
             
             file_id = file_info['file_id']
             filename = makeSafeFilename(file_info['file_name'])
@@ -45,14 +54,14 @@ class GoogleDriveDownloader:
             
             if success:
                 logger.info(f"Google Drive download completed: {filepath}")
-                return True
+                return filepath
             else:
                 logger.error("Google Drive download failed")
-                return False
-                
+                return None
+
         except Exception as e:
             logger.error(f"Google Drive download error: {str(e)}")
-            return False
+            return None
 
     def _download_file_from_drive(self, file_id, destination):
         """
@@ -67,17 +76,16 @@ class GoogleDriveDownloader:
         """
         try:
             URL = "https://docs.google.com/uc?export=download"
-            
-            session = requests.Session()
-            response = session.get(URL, params={'id': file_id}, stream=True)
+
+            response = self.session.get(URL, params={'id': file_id}, stream=True)
             token = self._get_confirm_token(response)
-            
+
             if token:
                 params = {'id': file_id, 'confirm': token}
-                response = session.get(URL, params=params, stream=True)
+                response = self.session.get(URL, params=params, stream=True)
             
-            with open(destination, "wb") as f:
-                for chunk in response.iter_content(chunk_size=32768):
+            with open(destination, "wb", buffering=DOWNLOAD_CHUNK) as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
                     if chunk:
                         f.write(chunk)
             
@@ -119,10 +127,22 @@ class GoogleDriveDownloader:
             return None
 
 
+# Module-level session for the legacy helpers; keep-alive avoids a new
+# TCP+TLS handshake on every call
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
 # Legacy functions for backward compatibility
 def get_direct_url(id):
     URL = "https://docs.google.com/uc?export=download"
-    session = requests.Session()
+    session = _get_session()
     response = session.get(URL, params = { 'id' : id }, stream = True)
     try:
         if response.url:
@@ -138,10 +158,24 @@ def get_confirm_token(response):
     return None
 
 
+# Targeted scan for the og:title tag; pulling one attribute does not
+# need a full BeautifulSoup parse of a 100+ KB page
+_OG_TITLE_RE = re.compile(rb'<meta[^>]+property="og:title"[^>]+content="([^"]+)"')
+
+
+@functools.lru_cache(maxsize=128)
 def get_info(url):
-    req = requests.get(url)
-    sp = BeautifulSoup(req.text,"html.parser")
-    file_name = sp.find('meta',{'property':'og:title'}).attrs['content']
+    req = _get_session().get(url)
+    match = _OG_TITLE_RE.search(req.content)
+    if match:
+        file_name = match.group(1).decode('utf-8', errors='replace')
+    elif HTMLParser is not None:
+        # Fall back to a real parse in case the markup changes shape
+        node = HTMLParser(req.content).css_first('meta[property="og:title"]')
+        file_name = node.attributes['content']
+    else:
+        sp = BeautifulSoup(req.text,"html.parser")
+        file_name = sp.find('meta',{'property':'og:title'}).attrs['content']
     file_id = url.split('/')[-2]
     file_url = get_direct_url(file_id)
     return {'file_name':file_name,'file_id':file_id,'file_url':file_url}
\ No newline at end of file
@@ -1,18 +1,34 @@
+import concurrent.futures
+import functools
+import math
 import re
+from urllib.parse import urlsplit
 import bs4
 import requests
 import user_agent
 import os
 import logging
-from .utils import ensure_dir_exists, get_url_file_name, makeSafeFilename
+from .utils import ensure_dir_exists, get_url_file_name, makeSafeFilename, DOWNLOAD_CHUNK
+
+# Files above this size are fetched as parallel Range segments when the
+# server advertises byte-range support
+SEGMENT_THRESHOLD = 16 * 1024 * 1024
+
+# Optional C-based HTML parser; several times faster than bs4's pure
+# Python tokenizer when installed
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
 
 logger = logging.getLogger(__name__)
 
 
 class MediaFireDownloader:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers["User-Agent"] = user_agent.generate_user_agent()
+    def __init__(self, session=None):
+        self.session = session or requests.Session()
+        if session is None:
+            self.session.headers["User-Agent"] = user_agent.generate_user_agent()
 
     def download(self, url, output_dir=None):
         """
@@ -21,22 +37,23 @@ class MediaFireDownloader:
         Args:
             url (str): MediaFire URL
             output_dir (str): Directory to save the file (optional)
-            
+
         Returns:
-            bool: True if successful, False otherwise
+            str: Path of the downloaded file, None if failed
         """
         try:
             # Get direct download URL
             download_url = self.get_direct_url(url)
             if not download_url:
                 logger.error("Failed to get MediaFire download URL")
-                return False
-            
+                return None
+
             # Download the file
-            response = self.session.get(download_url, stream=True)
+            response = self.session.get(download_url, stream=True,
+                                        timeout=(5, 60))
             if response.status_code != 200:
                 logger.error(f"Failed to download file: HTTP {response.status_code}")
-                return False
+                return None
             
             # Get filename
             filename = get_url_file_name(download_url, response)
@@ -49,19 +66,77 @@ class MediaFireDownloader:
             else:
                 filepath = filename
             
+            # Large files on range-capable servers: parallel segments
+            # saturate the pipe where a single connection cannot
+            file_size = int(response.headers.get('content-length') or 0)
+            if (file_size > SEGMENT_THRESHOLD
+                    and response.headers.get('Accept-Ranges') == 'bytes'
+                    and hasattr(os, 'pwrite')):
+                response.close()
+                try:
+                    logger.info("Downloading MediaFire file (segmented): %s",
+                                filename)
+                    self._download_segmented(download_url, filepath, file_size)
+                    logger.info("MediaFire download completed: %s", filepath)
+                    return filepath
+                except Exception as e:
+                    logger.warning("Segmented download failed (%s); "
+                                   "falling back to single stream", e)
+                    response = self.session.get(download_url, stream=True,
+                                                timeout=(5, 60))
+
             # Write file
             logger.info(f"Downloading MediaFire file: {filename}")
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+            with open(filepath, 'wb', buffering=DOWNLOAD_CHUNK) as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
                     if chunk:
                         f.write(chunk)
             
             logger.info(f"MediaFire download completed: {filepath}")
-            return True
-            
+            return filepath
+
         except Exception as e:
             logger.error(f"MediaFire download error: {str(e)}")
-            return False
+            return None
+
+    def _download_segmented(self, url, filepath, file_size):
+        """
+        Download a file as parallel Range segments into a preallocated file
+
+        Args:
+            url (str): Direct download URL supporting byte ranges
+            filepath (str): Local path to write to
+            file_size (int): Total size in bytes
+        """
+        workers = min(4, math.ceil(file_size / (4 * 1024 * 1024)))
+        segment = math.ceil(file_size / workers)
+
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, file_size)
+
+            def fetch(start):
+                end = min(start + segment, file_size) - 1
+                resp = self.session.get(
+                    url, headers={'Range': f'bytes={start}-{end}'},
+                    stream=True, timeout=(5, 60))
+                if resp.status_code != 206:
+                    raise Exception(f"Range request refused: "
+                                    f"HTTP {resp.status_code}")
+                offset = start
+                # pwrite hits each segment's own offset without seeking,
+                # so the workers share one descriptor safely
+                for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                    if chunk:
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers) as pool:
+                list(pool.map(fetch, range(0, file_size, segment)))
+        finally:
+            os.close(fd)
 
     def get_direct_url(self, url):
         """
@@ -80,16 +155,40 @@ class MediaFireDownloader:
             return None
 
 
+# Accepted mediafire hosts, compiled once instead of per call
+_DL_HOST_RE = re.compile(r"download[0-9]*\.mediafire\.com$")
+_WWW_HOST_RE = re.compile(r"[w]*\.mediafire\.com$")
+
+
+# Download button anchor; href may come before or after the id attribute
+_DOWNLOAD_BTN_RE = re.compile(
+    rb'<a[^>]+(?:id="downloadButton"[^>]+href="([^"]+)"'
+    rb'|href="([^"]+)"[^>]+id="downloadButton")')
+
+
+# Module-level session for the legacy helpers; keep-alive avoids a new
+# TCP+TLS handshake on every call
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers["User-Agent"] = user_agent.generate_user_agent()
+    return _session
+
+
 # Legacy function for backward compatibility
+@functools.lru_cache(maxsize=128)
 def get(url):
-    if re.match("download[0-9]*\.mediafire\.com", url.lstrip("https://").lstrip("http://").split("/")[0]):
-        data = url.lstrip("https://").lstrip("http://").split("/")
-        if len(data) <= 2:
-            raise Exception("Invalid mediafire download url")
-        unique_id = data[2]
-
-    elif re.match("[w]*\.mediafire\.com", url.lstrip("https://").lstrip("http://").split("/")[0]):
-        data = url.lstrip("https://").lstrip("http://").split("/")
+    # urlsplit handles schemes, ports and fragments correctly; the old
+    # lstrip("https://") stripped characters, not a prefix, and mangled
+    # hostnames starting with letters from the scheme
+    parts = urlsplit(url if '//' in url else '//' + url)
+    host = parts.hostname or ''
+    if _DL_HOST_RE.match(host) or _WWW_HOST_RE.match(host):
+        data = parts.path.split("/")
         if len(data) <= 2:
             raise Exception("Invalid mediafire download url")
         unique_id = data[2]
@@ -97,10 +196,20 @@ def get(url):
     else:
         raise Exception("No se encontro ningun link de descarga")
 
-    session = requests.Session()
-    session.headers["User-Agent"] = user_agent.generate_user_agent()
+    session = _get_session()
 
     data = session.get(f"https://www.mediafire.com/file/{unique_id}/")
+    # Targeted scan beats building a soup tree of the whole page for a
+    # single anchor; fall back to a real parse if the markup changes
+    match = _DOWNLOAD_BTN_RE.search(data.content)
+    if match:
+        link = match.group(1) or match.group(2)
+        return link.decode('utf-8', errors='replace')
+    if HTMLParser is not None:
+        btn = HTMLParser(data.content).css_first('a#downloadButton')
+        if btn is None:
+            raise Exception("Invalid download url")
+        return btn.attributes['href']
     wrp  = bs4.BeautifulSoup(data.text, "html.parser")
     btn  = wrp.find("a", attrs = {"id": "downloadButton"})
     if btn == None:
@@ -1,168 +1,233 @@
-from Crypto.Cipher import AES
-import json
-import base64
-import struct
-import binascii
-import random
-import sys
-
-# Python3 compatibility
-if sys.version_info < (3, ):
-
-    def makebyte(x):
-        return x
-
-    def makestring(x):
-        return x
-else:
-    import codecs
-
-    def makebyte(x):
-        return codecs.latin_1_encode(x)[0]
-
-    def makestring(x):
-        return codecs.latin_1_decode(x)[0]
-
-
-def aes_cbc_encrypt(data, key):
-    aes_cipher = AES.new(key, AES.MODE_CBC, makebyte('\0' * 16))
-    return aes_cipher.encrypt(data)
-
-
-def aes_cbc_decrypt(data, key):
-    aes_cipher = AES.new(key, AES.MODE_CBC, makebyte('\0' * 16))
-    return aes_cipher.decrypt(data)
-
-
-def aes_cbc_encrypt_a32(data, key):
-    return str_to_a32(aes_cbc_encrypt(a32_to_str(data), a32_to_str(key)))
-
-
-def aes_cbc_decrypt_a32(data, key):
-    return str_to_a32(aes_cbc_decrypt(a32_to_str(data), a32_to_str(key)))
-
-
-def stringhash(str, aeskey):
-    s32 = str_to_a32(str)
-    h32 = [0, 0, 0, 0]
-    for i in range(len(s32)):
-        h32[i % 4] ^= s32[i]
-    for r in range(0x4000):
-        h32 = aes_cbc_encrypt_a32(h32, aeskey)
-    return a32_to_base64((h32[0], h32[2]))
-
-
-def prepare_key(arr):
-    pkey = [0x93C467E3, 0x7DB0C7A4, 0xD1BE3F81, 0x0152CB56]
-    for r in range(0x10000):
-        for j in range(0, len(arr), 4):
-            key = [0, 0, 0, 0]
-            for i in range(4):
-                if i + j < len(arr):
-                    key[i] = arr[i + j]
-            pkey = aes_cbc_encrypt_a32(pkey, key)
-    return pkey
-
-
-def encrypt_key(a, key):
-    return sum((aes_cbc_encrypt_a32(a[i:i + 4], key)
-                for i in range(0, len(a), 4)), ())
-
-
-def decrypt_key(a, key):
-    return sum((aes_cbc_decrypt_a32(a[i:i + 4], key)
-                for i in range(0, len(a), 4)), ())
-
-
-def encrypt_attr(attr, key):
-    attr = makebyte('MEGA' + json.dumps(attr))
-    if len(attr) % 16:
-        attr += b'\0' * (16 - len(attr) % 16)
-    return aes_cbc_encrypt(attr, a32_to_str(key))
-
-
-def decrypt_attr(attr, key):
-    attr = aes_cbc_decrypt(attr, a32_to_str(key))
-    attr = makestring(attr)
-    attr = attr.rstrip('\0')
-    return json.loads(attr[4:]) if attr[:6] == 'MEGA{"' else False
-
-
-def a32_to_str(a):
-    return struct.pack('>%dI' % len(a), *a)
-
-
-def str_to_a32(b):
-    if isinstance(b, str):
-        b = makebyte(b)
-    if len(b) % 4:
-        # pad to multiple of 4
-        b += b'\0' * (4 - len(b) % 4)
-    return struct.unpack('>%dI' % (len(b) / 4), b)
-
-
-def mpi_to_int(s):
-    """
-    A Multi-precision integer is encoded as a series of bytes in big-endian
-    order. The first two bytes are a header which tell the number of bits in
-    the integer. The rest of the bytes are the integer.
-    """
-    return int(binascii.hexlify(s[2:]), 16)
-
-
-def extended_gcd(a, b):
-    if a == 0:
-        return (b, 0, 1)
-    else:
-        g, y, x = extended_gcd(b % a, a)
-        return (g, x - (b // a) * y, y)
-
-
-def modular_inverse(a, m):
-    g, x, y = extended_gcd(a, m)
-    if g != 1:
-        raise Exception('modular inverse does not exist')
-    else:
-        return x % m
-
-
-def base64_url_decode(data):
-    data += '=='[(2 - len(data) * 3) % 4:]
-    for search, replace in (('-', '+'), ('_', '/'), (',', '')):
-        data = data.replace(search, replace)
-    return base64.b64decode(data)
-
-
-def base64_to_a32(s):
-    return str_to_a32(base64_url_decode(s))
-
-
-def base64_url_encode(data):
-    data = base64.b64encode(data)
-    data = makestring(data)
-    for search, replace in (('+', '-'), ('/', '_'), ('=', '')):
-        data = data.replace(search, replace)
-    return data
-
-
-def a32_to_base64(a):
-    return base64_url_encode(a32_to_str(a))
-
-
-def get_chunks(size):
-    p = 0
-    s = 0x20000
-    while p + s < size:
-        yield (p, s)
-        p += s
-        if s < 0x100000:
-            s += 0x20000
-    yield (p, size - p)
-
-
-def make_id(length):
-    text = ''
-    possible = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
-    for i in range(length):
-        text += random.choice(possible)
-    return text
+from Crypto.Cipher import AES
+import json
+import base64
+import struct
+import binascii
+import random
+import sys
+
+# Python3 compatibility
+if sys.version_info < (3, ):
+
+    def makebyte(x):
+        return x
+
+    def makestring(x):
+        return x
+else:
+    import codecs
+
+    def makebyte(x):
+        return codecs.latin_1_encode(x)[0]
+
+    def makestring(x):
+        return codecs.latin_1_decode(x)[0]
+
+
+# Optional OpenSSL-backed AES; dispatches to AES-NI where the CPU has
+# it, with PyCryptodome as the fallback
+try:
+    from cryptography.hazmat.primitives.ciphers import (Cipher, algorithms,
+                                                        modes)
+except ImportError:
+    Cipher = None
+
+
+def aes_cbc_encrypt(data, key):
+    if Cipher is not None:
+        encryptor = Cipher(algorithms.AES(key),
+                           modes.CBC(b'\0' * 16)).encryptor()
+        return encryptor.update(data) + encryptor.finalize()
+    aes_cipher = AES.new(key, AES.MODE_CBC, makebyte('\0' * 16))
+    return aes_cipher.encrypt(data)
+
+
+def aes_cbc_decrypt(data, key):
+    if Cipher is not None:
+        decryptor = Cipher(algorithms.AES(key),
+                           modes.CBC(b'\0' * 16)).decryptor()
+        return decryptor.update(data) + decryptor.finalize()
+    aes_cipher = AES.new(key, AES.MODE_CBC, makebyte('\0' * 16))
+    return aes_cipher.decrypt(data)
+
+
+def aes_cbc_encrypt_a32(data, key):
+    return str_to_a32(aes_cbc_encrypt(a32_to_str(data), a32_to_str(key)))
+
+
+def aes_cbc_decrypt_a32(data, key):
+    return str_to_a32(aes_cbc_decrypt(a32_to_str(data), a32_to_str(key)))
+
+
+def stringhash(str, aeskey):
+    s32 = str_to_a32(str)
+    h32 = [0, 0, 0, 0]
+    for i in range(len(s32)):
+        h32[i % 4] ^= s32[i]
+    for r in range(0x4000):
+        h32 = aes_cbc_encrypt_a32(h32, aeskey)
+    return a32_to_base64((h32[0], h32[2]))
+
+
+def prepare_key(arr):
+    pkey = [0x93C467E3, 0x7DB0C7A4, 0xD1BE3F81, 0x0152CB56]
+    for r in range(0x10000):
+        for j in range(0, len(arr), 4):
+            key = [0, 0, 0, 0]
+            for i in range(4):
+                if i + j < len(arr):
+                    key[i] = arr[i + j]
+            pkey = aes_cbc_encrypt_a32(pkey, key)
+    return pkey
+
+
+def encrypt_key(a, key):
+    # Zero-IV CBC over independent 16-byte groups is exactly ECB; one
+    # cipher and one call replace a cipher, two conversions and a tuple
+    # concatenation per group
+    k = a32_to_str(key)
+    if Cipher is not None:
+        encryptor = Cipher(algorithms.AES(k), modes.ECB()).encryptor()
+        return str_to_a32(encryptor.update(a32_to_str(a)) +
+                          encryptor.finalize())
+    cipher = AES.new(k, AES.MODE_ECB)
+    return str_to_a32(cipher.encrypt(a32_to_str(a)))
+
+
+def decrypt_key(a, key):
+    k = a32_to_str(key)
+    if Cipher is not None:
+        decryptor = Cipher(algorithms.AES(k), modes.ECB()).decryptor()
+        return str_to_a32(decryptor.update(a32_to_str(a)) +
+                          decryptor.finalize())
+    cipher = AES.new(k, AES.MODE_ECB)
+    return str_to_a32(cipher.decrypt(a32_to_str(a)))
+
+
+def decrypt_ecb_a32(data, cipher):
+    """
+    Decrypt a32 data with a reusable AES-ECB cipher.
+
+    Equivalent to decrypt_key() for MEGA keys: every 16-byte group is
+    decrypted independently with a zero IV, which is exactly ECB
+    behaviour, but the cipher object is built once by the caller instead
+    of once per group per key.
+    """
+    return str_to_a32(cipher.decrypt(a32_to_str(data)))
+
+
+def derive_file_key(key):
+    """
+    Fold an 8-word node key into the 4-word AES key by XOR-ing halves.
+    """
+    return (key[0] ^ key[4], key[1] ^ key[5], key[2] ^ key[6],
+            key[3] ^ key[7])
+
+
+def derive_meta_mac(file_mac):
+    """
+    Condense a 4-word CBC-MAC state into the 2-word meta MAC.
+    """
+    return (file_mac[0] ^ file_mac[1], file_mac[2] ^ file_mac[3])
+
+
+def encrypt_attr(attr, key):
+    attr = makebyte('MEGA' + json.dumps(attr))
+    if len(attr) % 16:
+        attr += b'\0' * (16 - len(attr) % 16)
+    return aes_cbc_encrypt(attr, a32_to_str(key))
+
+
+def decrypt_attr(attr, key):
+    attr = aes_cbc_decrypt(attr, a32_to_str(key))
+    attr = makestring(attr)
+    attr = attr.rstrip('\0')
+    return json.loads(attr[4:]) if attr[:6] == 'MEGA{"' else False
+
+
+def a32_to_str(a):
+    return struct.pack('>%dI' % len(a), *a)
+
+
+def str_to_a32(b):
+    if isinstance(b, str):
+        b = makebyte(b)
+    if len(b) % 4:
+        # pad to multiple of 4
+        b += b'\0' * (4 - len(b) % 4)
+    return struct.unpack('>%dI' % (len(b) / 4), b)
+
+
+def mpi_to_int(s):
+    """
+    A Multi-precision integer is encoded as a series of bytes in big-endian
+    order. The first two bytes are a header which tell the number of bits in
+    the integer. The rest of the bytes are the integer.
+    """
+    return int(binascii.hexlify(s[2:]), 16)
+
+
+def extended_gcd(a, b):
+    if a == 0:
+        return (b, 0, 1)
+    else:
+        g, y, x = extended_gcd(b % a, a)
+        return (g, x - (b // a) * y, y)
+
+
+def modular_inverse(a, m):
+    g, x, y = extended_gcd(a, m)
+    if g != 1:
+        raise Exception('modular inverse does not exist')
+    else:
+        return x % m
+
+
+# url-safe alphabet fixup as one translation table: '-'/'_' map to
+# '+'/'/' and stray ',' is deleted, replacing three .replace() passes
+_B64_URL_FIX = str.maketrans('-_', '+/', ',')
+
+
+def base64_url_decode(data):
+    data += '=='[(2 - len(data) * 3) % 4:]
+    return base64.b64decode(data.translate(_B64_URL_FIX))
+
+
+def base64_to_a32(s):
+    # base64_url_decode always hands back bytes, so the str check in
+    # str_to_a32 can be skipped and the words unpacked directly
+    b = base64_url_decode(s)
+    if len(b) % 4:
+        b += b'\0' * (4 - len(b) % 4)
+    return struct.unpack('>%dI' % (len(b) // 4), b)
+
+
+def base64_url_encode(data):
+    data = base64.b64encode(data)
+    data = makestring(data)
+    for search, replace in (('+', '-'), ('/', '_'), ('=', '')):
+        data = data.replace(search, replace)
+    return data
+
+
+def a32_to_base64(a):
+    return base64_url_encode(a32_to_str(a))
+
+
+def get_chunks(size):
+    p = 0
+    s = 0x20000
+    while p + s < size:
+        yield (p, s)
+        p += s
+        if s < 0x100000:
+            s += 0x20000
+    yield (p, size - p)
+
+
+def make_id(length):
+    text = ''
+    possible = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+    for i in range(length):
+        text += random.choice(possible)
+    return text
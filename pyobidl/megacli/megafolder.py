@@ -1,84 +1,97 @@
-from mega.crypto import base64_to_a32, base64_url_decode, decrypt_attr, decrypt_key
-import requests
-import re
-import json
-
-def get_nodes_in_shared_folder(root_folder: str) -> dict:
-    data = [{"a": "f", "c": 1, "ca": 1, "r": 1}]
-    response = requests.post(
-        "https://g.api.mega.co.nz/cs",
-        params={'id': 0,  # self.sequence_num
-                'n': root_folder},
-        data=json.dumps(data)
-    )
-    json_resp = response.json()
-    return json_resp[0]["f"]
-
-def get_whit_node(root_folder,node):
-    data = [{ 'a': 'g', 'g': 1, 'n': node['h'] }]
-    response = requests.post(
-        "https://g.api.mega.co.nz/cs",
-        params={'id': 0,  # self.sequence_num
-                'n': root_folder},
-        data=json.dumps(data)
-    )
-    json_resp = response.json()
-    return json_resp
-
-def parse_folder_url(url: str):
-    "Returns (public_handle, key) if valid. If not returns None."
-    REGEXP1 = re.compile(r"mega.[^/]+/folder/([0-z-_]+)#([0-z-_]+)(?:/folder/([0-z-_]+))*")
-    REGEXP2 = re.compile(r"mega.[^/]+/#F!([0-z-_]+)[!#]([0-z-_]+)(?:/folder/([0-z-_]+))*")
-    m = re.search(REGEXP1, url)
-    if not m:
-        m = re.search(REGEXP2, url)
-    if not m:
-        print("Not a valid URL")
-        return None
-    root_folder = m.group(1)
-    key = m.group(2)
-    # You may want to use m.group(-1)
-    # to get the id of the subfolder
-    return (root_folder, key)
-
-def decrypt_node_key(key_str: str, shared_key: str):
-    encrypted_key = base64_to_a32(key_str.split(":")[1])
-    return decrypt_key(encrypted_key, shared_key)
-
-def get_files_from_folder(url:str):
-    files = []
-    (root_folder, shared_enc_key) = parse_folder_url(url)
-    shared_key = base64_to_a32(shared_enc_key)
-    nodes = get_nodes_in_shared_folder(root_folder)
-    for node in nodes:
-        if node["t"] == 1: continue
-        if node["t"] == 0:
-           try:
-               data = get_whit_node(root_folder,node)[0]
-               key = decrypt_node_key(node["k"], shared_key)
-               k = (key[0] ^ key[4], key[1] ^ key[5], key[2] ^ key[6], key[3] ^ key[7])
-               attrs = decrypt_attr(base64_url_decode(node["a"]),k)
-               file_name = attrs["n"]
-               file_id = node["h"]
-               files.append({'name':file_name,'handle':file_id,'key':key,'data':data})
-           except:pass
-    return files
-
-async def async_get_files_from_folder(url:str):
-    files = []
-    (root_folder, shared_enc_key) = parse_folder_url(url)
-    shared_key = base64_to_a32(shared_enc_key)
-    nodes = get_nodes_in_shared_folder(root_folder)
-    for node in nodes:
-        if node["t"] == 1: continue
-        if node["t"] == 0:
-           try:
-               data = get_whit_node(root_folder,node)[0]
-               key = decrypt_node_key(node["k"], shared_key)
-               k = (key[0] ^ key[4], key[1] ^ key[5], key[2] ^ key[6], key[3] ^ key[7])
-               attrs = decrypt_attr(base64_url_decode(node["a"]),k)
-               file_name = attrs["n"]
-               file_id = node["h"]
-               files.append({'name':file_name,'handle':file_id,'key':key,'data':data})
-           except:pass
-    return files
\ No newline at end of file
+from .crypto import (base64_to_a32, base64_url_decode, decrypt_attr,
+                     decrypt_key, derive_file_key)
+import asyncio
+import concurrent.futures
+import requests
+import re
+import json
+
+# Shared session keeps the per-node metadata calls on one keep-alive
+# connection instead of a fresh handshake per request
+_session = requests.Session()
+
+def get_nodes_in_shared_folder(root_folder: str) -> dict:
+    data = [{"a": "f", "c": 1, "ca": 1, "r": 1}]
+    response = _session.post(
+        "https://g.api.mega.co.nz/cs",
+        params={'id': 0,  # self.sequence_num
+                'n': root_folder},
+        data=json.dumps(data)
+    )
+    json_resp = response.json()
+    return json_resp[0]["f"]
+
+def get_whit_node(root_folder,node):
+    data = [{ 'a': 'g', 'g': 1, 'n': node['h'] }]
+    response = _session.post(
+        "https://g.api.mega.co.nz/cs",
+        params={'id': 0,  # self.sequence_num
+                'n': root_folder},
+        data=json.dumps(data)
+    )
+    json_resp = response.json()
+    return json_resp
+
+def parse_folder_url(url: str):
+    "Returns (public_handle, key) if valid. If not returns None."
+    REGEXP1 = re.compile(r"mega.[^/]+/folder/([0-z-_]+)#([0-z-_]+)(?:/folder/([0-z-_]+))*")
+    REGEXP2 = re.compile(r"mega.[^/]+/#F!([0-z-_]+)[!#]([0-z-_]+)(?:/folder/([0-z-_]+))*")
+    m = re.search(REGEXP1, url)
+    if not m:
+        m = re.search(REGEXP2, url)
+    if not m:
+        print("Not a valid URL")
+        return None
+    root_folder = m.group(1)
+    key = m.group(2)
+    # You may want to use m.group(-1)
+    # to get the id of the subfolder
+    return (root_folder, key)
+
+def decrypt_node_key(key_str: str, shared_key: str):
+    encrypted_key = base64_to_a32(key_str.split(":")[1])
+    return decrypt_key(encrypted_key, shared_key)
+
+def _fetch_file_entry(root_folder, shared_key, node):
+    "Fetch and decrypt the metadata of one file node. None on failure."
+    try:
+        data = get_whit_node(root_folder,node)[0]
+        key = decrypt_node_key(node["k"], shared_key)
+        k = derive_file_key(key)
+        attrs = decrypt_attr(base64_url_decode(node["a"]),k)
+        return {'name':attrs["n"],'handle':node["h"],'key':key,'data':data}
+    except:
+        return None
+
+def get_files_from_folder(url:str):
+    (root_folder, shared_enc_key) = parse_folder_url(url)
+    shared_key = base64_to_a32(shared_enc_key)
+    nodes = get_nodes_in_shared_folder(root_folder)
+    file_nodes = [node for node in nodes if node["t"] == 0]
+    if not file_nodes:
+        return []
+    # Each node needs its own metadata request; they are independent, so
+    # fetch them in parallel instead of one round-trip at a time
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(8, len(file_nodes))) as pool:
+        results = pool.map(
+            lambda node: _fetch_file_entry(root_folder, shared_key, node),
+            file_nodes)
+    return [entry for entry in results if entry]
+
+async def async_get_files_from_folder(url:str):
+    loop = asyncio.get_running_loop()
+    (root_folder, shared_enc_key) = parse_folder_url(url)
+    shared_key = base64_to_a32(shared_enc_key)
+    nodes = await loop.run_in_executor(None, get_nodes_in_shared_folder,
+                                       root_folder)
+    file_nodes = [node for node in nodes if node["t"] == 0]
+    if not file_nodes:
+        return []
+    semaphore = asyncio.Semaphore(8)
+    async def fetch(node):
+        async with semaphore:
+            return await loop.run_in_executor(None, _fetch_file_entry,
+                                              root_folder, shared_key, node)
+    results = await asyncio.gather(*(fetch(node) for node in file_nodes))
+    return [entry for entry in results if entry]
\ No newline at end of file
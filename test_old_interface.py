@@ -5,19 +5,91 @@ Test Old Downloader Interface
 This demonstrates that your exact old code now works with the new recreated mega module.
 """
 
+import asyncio
+import contextlib
+import functools
+import io
 import os
+import socket
 import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add the pyobidl directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'pyobidl'))
 
-from pyobidl.downloader import Downloader
 from pyobidl.utils import setup_logging
 
-# Test URL
+def _get_downloader():
+    """Import Downloader on first use
+
+    The downloader module drags in requests, Crypto and the platform
+    backends; deferring the import keeps startup and quick-fail paths
+    from paying several hundred ms of module init.
+    """
+    from pyobidl.downloader import Downloader
+    return Downloader
+
+# Optional pytest layer: the same test_* functions double as a pytest
+# module with a session-scoped Downloader, so CI can fan them out with
+# pytest-xdist (-n auto) while `python test_old_interface.py` keeps
+# working without pytest installed
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture(scope="session")
+    def dl(tmp_path_factory):
+        downloader = _get_downloader()(
+            destpath=str(tmp_path_factory.mktemp("downloads")))
+        yield downloader
+        downloader.stop()
+
+# Test URLs; add more entries to probe a batch in one run
 TEST_URL = "https://mega.nz/file/5r1nWZwK#DlBpWv2Hc0zLhjuldVF8ZJKepkBfZyNYPh7feSOA7jI"
+TEST_URLS = [TEST_URL]
+
+# Metadata rarely changes; repeat download_info calls within the TTL
+# come out of this dict instead of costing a network round trip
+_META_CACHE = {}
+_META_TTL = 300.0
 
+def buffered_output(func):
+    """Collect a test's prints and emit them with one write
+
+    print() flushes per line on a terminal; batching a whole test body
+    into one sys.stdout.write turns dozens of write syscalls into one.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        buf = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(buf):
+                return func(*args, **kwargs)
+        finally:
+            sys.stdout.write(buf.getvalue())
+    return wrapper
+
+def cached_download_info(dl, url):
+    """download_info with a small per-URL TTL cache"""
+    now = time.monotonic()
+    hit = _META_CACHE.get(url)
+    if hit is not None and now - hit[0] < _META_TTL:
+        return hit[1]
+    infos = dl.download_info(url)
+    if infos is None:
+        # Failed lookups are not cached; the next call retries
+        _META_CACHE.pop(url, None)
+    else:
+        _META_CACHE[url] = (now, infos)
+    return infos
+
+@buffered_output
 def test_exact_old_code():
     """Test the exact code you wanted to use"""
     print("🔄 Testing Your Exact Old Code")
@@ -25,7 +97,30 @@ def test_exact_old_code():
     
     # YOUR EXACT CODE (now working with new backend):
     extract_folder = "temp"
-    dl = Downloader(destpath=extract_folder)
+    dl = _get_downloader()(destpath=extract_folder)
+    
+    # Shared keep-alive session: every call in this script reuses one
+    # pooled connection instead of handshaking per request. Assigning
+    # the attribute overrides the cached_property before first use.
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                          max_retries=Retry(total=3, backoff_factor=0.2))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    dl._session = session
+    
+    # Pre-warm DNS + TCP + TLS to mega.nz in the background so the
+    # first timed call starts from a warm pooled connection
+    def _prime():
+        try:
+            socket.getaddrinfo('mega.nz', 443)
+            session.head('https://mega.nz/', timeout=5)
+        except Exception:
+            pass
+    threading.Thread(target=_prime, daemon=True).start()
     
     print(f"✅ Downloader created successfully!")
     print(f"📁 Destination path: {dl.destpath}")
@@ -33,58 +128,82 @@ def test_exact_old_code():
     
     return dl
 
+async def run_probes(dl, urls):
+    """Probe download_info for every URL concurrently
+
+    The Downloader is synchronous, so each probe runs in the default
+    executor while the event loop overlaps the network waits; N URLs
+    cost roughly one round trip instead of N.
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(
+        *[loop.run_in_executor(None, cached_download_info, dl, url)
+          for url in urls])
+
+@buffered_output
 def test_download_info(dl):
     """Test the download_info method"""
     print("\n🔍 Testing download_info()")
     print("="*50)
     
     try:
-        infos = dl.download_info(TEST_URL)
+        all_infos = asyncio.run(run_probes(dl, TEST_URLS))
         
-        if infos:
-            print("✅ download_info() successful!")
-            for info in infos:
-                print(f"📄 File: {info.get('fname', 'Unknown')}")
-                print(f"🔗 URL: {info.get('furl', 'Unknown')}")
-                print(f"📊 Platform: {info.get('platform', 'Unknown')}")
-                print(f"📐 Size: {info.get('fsize', 0)} bytes")
-        else:
-            print("❌ download_info() failed!")
+        success = True
+        for url, infos in zip(TEST_URLS, all_infos):
+            if infos:
+                print("✅ download_info() successful!")
+                for info in infos:
+                    print(f"📄 File: {info.get('fname', 'Unknown')}")
+                    print(f"🔗 URL: {info.get('furl', 'Unknown')}")
+                    print(f"📊 Platform: {info.get('platform', 'Unknown')}")
+                    print(f"📐 Size: {info.get('fsize', 0)} bytes")
+            else:
+                print(f"❌ download_info() failed for {url}!")
+                success = False
             
-        return infos is not None
+        return success
         
     except Exception as e:
         print(f"❌ download_info() error: {e}")
         return False
 
+@buffered_output
 def test_download_url(dl):
     """Test the download_url method"""
     print("\n📥 Testing download_url()")
     print("="*50)
     
     try:
-        result = dl.download_url(TEST_URL)
+        # One worker per URL (capped at 8) keeps several transfers in
+        # flight; the GIL is released inside the socket and disk calls
+        with ThreadPoolExecutor(max_workers=min(8, len(TEST_URLS))) as pool:
+            results = list(pool.map(dl.download_url, TEST_URLS))
         
-        if result:
-            print(f"✅ download_url() successful!")
-            print(f"📄 Downloaded file: {result}")
-            
-            # Check if file exists
-            if os.path.exists(result):
-                size = os.path.getsize(result)
-                print(f"📐 File size: {size:,} bytes")
-            else:
-                print("⚠️  File path returned but file not found")
+        success = True
+        for url, result in zip(TEST_URLS, results):
+            if result:
+                print(f"✅ download_url() successful!")
+                print(f"📄 Downloaded file: {result}")
                 
-        else:
-            print("❌ download_url() failed!")
+                # One stat call, no exists/getsize TOCTOU window
+                try:
+                    size = os.stat(result).st_size
+                    print(f"📐 File size: {size:,} bytes")
+                except FileNotFoundError:
+                    print("⚠️  File path returned but file not found")
+                    
+            else:
+                print(f"❌ download_url() failed for {url}!")
+                success = False
             
-        return result is not None
+        return success
         
     except Exception as e:
         print(f"❌ download_url() error: {e}")
         return False
 
+@buffered_output
 def test_other_methods(dl):
     """Test other methods for completeness"""
     print("\n🧪 Testing Other Methods")
@@ -102,23 +221,26 @@ def test_other_methods(dl):
     dl.stoping = False
     print(f"🔄 Reset stopping = {dl.stoping}")
 
+@buffered_output
 def show_files_in_directory(extract_folder):
     """Show files in the extract folder"""
     print(f"\n📁 Files in {extract_folder}:")
     print("="*50)
     
-    if os.path.exists(extract_folder):
-        files = [f for f in os.listdir(extract_folder) 
-                if os.path.isfile(os.path.join(extract_folder, f))]
-        if files:
-            for file in files:
-                file_path = os.path.join(extract_folder, file)
-                size = os.path.getsize(file_path)
-                print(f"📄 {file} ({size:,} bytes)")
-        else:
-            print("📂 (empty)")
-    else:
+    # scandir returns entries carrying their stat data, so one getdents
+    # pass replaces a listdir plus two stat syscalls per file
+    try:
+        with os.scandir(extract_folder) as it:
+            entries = [(entry.name, entry.stat().st_size) for entry in it
+                       if entry.is_file(follow_symlinks=False)]
+    except FileNotFoundError:
         print("📂 (directory doesn't exist)")
+        return
+    if entries:
+        for name, size in entries:
+            print(f"📄 {name} ({size:,} bytes)")
+    else:
+        print("📂 (empty)")
 
 def main():
     """Main test function"""
@@ -159,7 +281,6 @@ def main():
         
     except Exception as e:
         print(f"❌ Test error: {e}")
-        import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":